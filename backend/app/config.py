@@ -1,28 +1,37 @@
 import os
+from dataclasses import dataclass, field
 
 
+def _parse_cors_origins() -> tuple[str, ...]:
+    """Parse CORS_ORIGINS from environment variable.
+
+    Comma-separated list of allowed origins, e.g.
+    "http://localhost:5173,https://app.example.com". Returned as an
+    immutable tuple so it is parsed exactly once at import.
+    """
+    cors_env = os.getenv("CORS_ORIGINS", "")
+    return tuple(
+        origin.strip()
+        for origin in cors_env.split(",")
+        if origin.strip()
+    )
+
+
+@dataclass(frozen=True, slots=True)
 class Settings:
-    DATABASE_URL: str = os.getenv("DATABASE_URL")
-    SECRET_KEY: str = os.getenv("SECRET_KEY")
-    UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "/tmp/docproc_uploads")
-    
-    # CORS Configuration - comma-separated list of allowed origins
-    # Example: "http://localhost:5173,https://app.example.com"
-    CORS_ORIGINS: list[str] = []
-
-    def __init__(self):
-        self._parse_cors_origins()
-        self._validate_required_vars()
+    """Application settings, resolved from the environment once at import.
 
-    def _parse_cors_origins(self):
-        """Parse CORS_ORIGINS from environment variable."""
-        cors_env = os.getenv("CORS_ORIGINS", "")
-        if cors_env:
-            self.CORS_ORIGINS = [
-                origin.strip() 
-                for origin in cors_env.split(",") 
-                if origin.strip()
-            ]
+    Frozen with slots so attribute access is a fixed-offset read and values
+    cannot drift after startup; os.getenv is never consulted on a hot path.
+    """
+
+    DATABASE_URL: str = field(default_factory=lambda: os.getenv("DATABASE_URL"))
+    SECRET_KEY: str = field(default_factory=lambda: os.getenv("SECRET_KEY"))
+    UPLOAD_DIR: str = field(default_factory=lambda: os.getenv("UPLOAD_DIR", "/tmp/docproc_uploads"))
+    CORS_ORIGINS: tuple[str, ...] = field(default_factory=_parse_cors_origins)
+
+    def __post_init__(self):
+        self._validate_required_vars()
 
     def _validate_required_vars(self):
         missing = []
@@ -32,7 +41,7 @@ class Settings:
             missing.append("SECRET_KEY")
         if not self.CORS_ORIGINS:
             missing.append("CORS_ORIGINS")
-        
+
         if missing:
             raise EnvironmentError(
                 f"Missing required environment variables: {', '.join(missing)}. "
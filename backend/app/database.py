@@ -1,9 +1,29 @@
+import asyncio
+
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 
 from app.config import settings
 
-engine = create_async_engine(settings.DATABASE_URL, echo=False)
+# Every handler goes through Depends(get_db), so pool behavior dominates
+# concurrency. pool_size holds 20 warm connections; max_overflow absorbs
+# bursts up to 60 total. pre_ping is off — it adds a round-trip to every
+# checkout, and recycling connections every 30 minutes already bounds the
+# lifetime of anything a flaky network could have broken.
+#
+# A generous prepared-statement cache lets asyncpg reuse server-side plans
+# for repeated statements (notably the /search CTE), skipping Postgres
+# parse/plan work on every request after the first.
+engine = create_async_engine(
+    settings.DATABASE_URL,
+    echo=False,
+    pool_size=20,
+    max_overflow=40,
+    pool_pre_ping=False,
+    pool_recycle=1800,
+    connect_args={"prepared_statement_cache_size": 500},
+)
 
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
@@ -15,6 +35,102 @@ async def get_db():
         yield session
 
 
+async def warm_pool():
+    """Pre-opens pool_size connections so early requests never pay
+    connection setup (TCP + TLS + auth) inline.
+
+    The connections must be held concurrently — opening and closing them
+    one at a time would just reuse a single pooled connection.
+    """
+    pool_size = engine.pool.size()
+
+    async def _hold(ready: asyncio.Barrier):
+        async with engine.connect():
+            await ready.wait()
+
+    barrier = asyncio.Barrier(pool_size)
+    await asyncio.gather(*(_hold(barrier) for _ in range(pool_size)))
+
+
 async def init_db():
     async with engine.begin() as conn:
+        # pg_trgm backs the trigram GIN indexes on filenames and tag names
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         await conn.run_sync(Base.metadata.create_all)
+        # In-place upgrades for databases created before these columns and
+        # indexes existed: create_all only creates missing tables, never
+        # alters existing ones, and compose keeps Postgres on a persistent
+        # volume — without these, /search and the upload INSERT would hit
+        # UndefinedColumn on an upgraded database.
+        await conn.execute(text(
+            "ALTER TABLE documents ADD COLUMN IF NOT EXISTS snippet varchar(210)"
+        ))
+        await conn.execute(text("""
+            UPDATE documents
+            SET snippet = CASE
+                WHEN char_length(COALESCE(content, '')) > 200
+                     THEN left(content, 200) || '...'
+                ELSE COALESCE(content, '')
+            END
+            WHERE snippet IS NULL
+        """))
+        # Existing tables never pick up a server_default added to the
+        # model; without these, new rows on an upgraded database would be
+        # inserted with NULL timestamps now that the client-side defaults
+        # are gone
+        await conn.execute(text(
+            "ALTER TABLE documents ALTER COLUMN created_at SET DEFAULT now()"
+        ))
+        await conn.execute(text(
+            "ALTER TABLE tags ALTER COLUMN created_at SET DEFAULT now()"
+        ))
+        await conn.execute(text(
+            "ALTER TABLE processing_statuses ALTER COLUMN processed_at SET DEFAULT now()"
+        ))
+        # Indexes added to the models after a table already existed
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_documents_search_vector
+            ON documents USING gin (search_vector) WITH (fastupdate = off)
+        """))
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_documents_filename_trgm
+            ON documents USING gin (filename gin_trgm_ops)
+        """))
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_tags_name_trgm
+            ON tags USING gin (name gin_trgm_ops)
+        """))
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_documents_created_id
+            ON documents (created_at DESC, id DESC)
+        """))
+        # Backfill search_vector for rows from before it was set on insert,
+        # then enforce NOT NULL so the planner never needs the seq-scan
+        # ILIKE fallback for unvectorized documents
+        await conn.execute(text("""
+            UPDATE documents
+            SET search_vector = to_tsvector('portuguese', COALESCE(content, ''))
+            WHERE search_vector IS NULL
+        """))
+        await conn.execute(text(
+            "ALTER TABLE documents ALTER COLUMN search_vector SET NOT NULL"
+        ))
+        # The trigger keeps search_vector current for every writer (app,
+        # seed scripts, manual UPDATEs) — no code path can insert content
+        # without its vector
+        await conn.execute(text("""
+            CREATE OR REPLACE FUNCTION documents_search_vector_update() RETURNS trigger AS $$
+            BEGIN
+                NEW.search_vector := to_tsvector('portuguese', COALESCE(NEW.content, ''));
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql
+        """))
+        await conn.execute(text(
+            "DROP TRIGGER IF EXISTS trg_documents_search_vector ON documents"
+        ))
+        await conn.execute(text("""
+            CREATE TRIGGER trg_documents_search_vector
+            BEFORE INSERT OR UPDATE OF content ON documents
+            FOR EACH ROW EXECUTE FUNCTION documents_search_vector_update()
+        """))
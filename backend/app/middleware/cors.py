@@ -0,0 +1,85 @@
+"""
+Pure-ASGI CORS middleware.
+
+Starlette's CORSMiddleware is built on BaseHTTPMiddleware, which buffers
+response bodies through an anyio memory channel and constructs Request/
+Response objects on every call. For our small JSON endpoints that wrapper
+is a measurable share of the per-request cost, so CORS is handled here
+directly at the ASGI message level: headers are precomputed once at
+startup and injected into the "http.response.start" message.
+"""
+
+
+class PureASGICORS:
+    """ASGI middleware that adds CORS headers without Request/Response objects.
+
+    Origins, methods, and headers are fixed at construction time, so all
+    header values are precomputed as bytes and the per-request work is a
+    set lookup plus a list extend.
+    """
+
+    def __init__(
+        self,
+        app,
+        allow_origins: list[str],
+        allow_methods: list[str],
+        allow_headers: list[str],
+        allow_credentials: bool = False,
+    ):
+        self.app = app
+        self.allow_origins = frozenset(origin.encode("latin-1") for origin in allow_origins)
+        allow_methods_b = ", ".join(allow_methods).encode("latin-1")
+        allow_headers_b = ", ".join(allow_headers).encode("latin-1")
+
+        # Headers appended to every simple (non-preflight) response.
+        self.simple_headers: list[tuple[bytes, bytes]] = []
+        if allow_credentials:
+            self.simple_headers.append((b"access-control-allow-credentials", b"true"))
+        self.simple_headers.append((b"vary", b"Origin"))
+
+        # Headers for preflight responses (minus the echoed origin).
+        self.preflight_headers: list[tuple[bytes, bytes]] = [
+            (b"access-control-allow-methods", allow_methods_b),
+            (b"access-control-allow-headers", allow_headers_b),
+            (b"access-control-max-age", b"600"),
+            (b"vary", b"Origin"),
+        ]
+        if allow_credentials:
+            self.preflight_headers.append((b"access-control-allow-credentials", b"true"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        origin = headers.get(b"origin")
+
+        if origin is None or origin not in self.allow_origins:
+            # Not a CORS request (or a disallowed origin): pass through untouched.
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] == "OPTIONS" and b"access-control-request-method" in headers:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [
+                        (b"access-control-allow-origin", origin),
+                        *self.preflight_headers,
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"])
+                message["headers"].append((b"access-control-allow-origin", origin))
+                message["headers"].extend(self.simple_headers)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,7 +1,6 @@
-from sqlalchemy import Column, Index, Integer, String, Text, DateTime, ForeignKey, Table
+from sqlalchemy import Column, Index, Integer, String, Text, DateTime, ForeignKey, Table, func
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import TSVECTOR
-from datetime import datetime
 
 from app.database import Base
 
@@ -21,7 +20,18 @@ class Tag(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False, unique=True, index=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=func.now())
+
+    # Trigram GIN index so tag-name ILIKE searches avoid a seq scan
+    # (requires the pg_trgm extension, created in init_db)
+    __table_args__ = (
+        Index(
+            "ix_tags_name_trgm",
+            name,
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
 
     # Many-to-many relationship with documents
     documents = relationship(
@@ -38,19 +48,41 @@ class Document(Base):
     filename = Column(String(255), nullable=False)
     file_path = Column(String(512), nullable=True)  # Path to physical file on disk
     content = Column(Text)
-    # Pre-computed tsvector for full-text search (populated on insert/update)
-    search_vector = Column(TSVECTOR, nullable=True)
+    # First 200 chars of content (plus ellipsis), precomputed at upload so
+    # search results never detoast the potentially multi-MB content column
+    snippet = Column(String(210), nullable=True)
+    # Pre-computed tsvector for full-text search, maintained by a BEFORE
+    # INSERT OR UPDATE trigger (see init_db) so it stays current no matter
+    # who writes content. NOT NULL so the planner always has the
+    # GIN-indexed path — no seq-scan ILIKE fallback for unvectorized rows.
+    search_vector = Column(TSVECTOR, nullable=False)
     file_size = Column(Integer)
     page_count = Column(Integer)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # Filled in by Postgres at insert time: no client-side datetime
+    # allocation or wire bytes, and no clock skew between app servers
+    created_at = Column(DateTime, server_default=func.now())
 
-    # GIN index for fast full-text search queries
+    # GIN indexes: full-text search on search_vector, and a trigram index
+    # so filename ILIKE searches avoid a seq scan (requires pg_trgm)
     __table_args__ = (
+        # fastupdate off: entries go straight into the index instead of a
+        # pending list, so reads never pay a pending-list scan — the right
+        # trade for this read-heavy workload
         Index(
             "ix_documents_search_vector",
             search_vector,
             postgresql_using="gin",
+            postgresql_with={"fastupdate": "off"},
+        ),
+        Index(
+            "ix_documents_filename_trgm",
+            filename,
+            postgresql_using="gin",
+            postgresql_ops={"filename": "gin_trgm_ops"},
         ),
+        # Composite index matching the listing order, so keyset pagination
+        # seeks straight to the cursor position instead of discarding rows
+        Index("ix_documents_created_id", created_at.desc(), id.desc()),
     )
 
     processing_status = relationship(
@@ -80,6 +112,6 @@ class ProcessingStatus(Base):
     )
     status = Column(String(50), default="completed")
     error_message = Column(Text, nullable=True)
-    processed_at = Column(DateTime, nullable=True)
+    processed_at = Column(DateTime, nullable=True, server_default=func.now())
 
     document = relationship("Document", back_populates="processing_status")
@@ -1,17 +1,20 @@
 import os
 import re
-import uuid
+import secrets
 from datetime import datetime
+from functools import lru_cache
 
-from fastapi import APIRouter, Depends, UploadFile, HTTPException, Query
-from sqlalchemy import select, func, text
+import aiofiles
+from fastapi import APIRouter, Depends, Request, Response, UploadFile, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import ARRAY, Text, bindparam, delete, select, func, text, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.database import get_db
 from app.models import Document, ProcessingStatus, Tag, document_tags
+from app.routes.search import invalidate_search_cache
 from app.schemas import DocumentResponse, DocumentDetail, DocumentListResponse, TagResponse
-from app.services.pdf_processor import extract_text_from_pdf
 from app.config import settings
 
 # Pagination defaults
@@ -23,69 +26,147 @@ ALLOWED_CONTENT_TYPES = {"application/pdf"}
 ALLOWED_EXTENSIONS = {".pdf"}
 PDF_MAGIC_BYTES = b"%PDF"  # PDF files start with this signature
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50 MB
+MAX_SIZE_MB = MAX_FILE_SIZE // (1024 * 1024)  # For error messages
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # Stream uploads to disk in 1 MiB chunks
+
+# UPLOAD_DIR is fixed for the life of the process, so normalize it once here.
+_UPLOAD_DIR = settings.UPLOAD_DIR
+_UPLOAD_DIR_PREFIX = os.path.normpath(_UPLOAD_DIR) + os.sep
 
 router = APIRouter()
 
+# Loader options for every route that serializes DocumentResponse: tags and
+# processing status are always fetched in batched IN queries alongside the
+# documents (selectinload rather than joinedload, to avoid a cartesian row
+# explosion on multi-tag documents), so no route can reintroduce an N+1.
+_DOCUMENT_LOAD_OPTIONS = (
+    selectinload(Document.processing_status),
+    selectinload(Document.tags),
+)
+
+# Inserts a document from its per-page text array. Concatenation and the
+# snippet both happen server-side, so Python never materializes the full
+# document text — for a large PDF that halves the upload's peak memory
+# (the page list is the only copy held). search_vector is filled in by
+# the BEFORE INSERT trigger (see init_db) from the assembled content.
+_INSERT_DOCUMENT = text("""
+    INSERT INTO documents (filename, file_path, content, snippet, file_size, page_count)
+    SELECT :filename, :file_path, c.content,
+           CASE WHEN char_length(c.content) > 200
+                THEN left(c.content, 200) || '...'
+                ELSE c.content
+           END,
+           :file_size, :page_count
+    FROM (SELECT array_to_string(:pages, '') AS content) AS c
+    RETURNING id
+""").bindparams(bindparam("pages", type_=ARRAY(Text)))
+
+# Document representations include tags, so their ETags must move when a
+# tag association changes even though the row's own columns don't. The
+# generation counter is mixed into every document ETag and bumped on the
+# mutations that can change a cached representation without touching
+# created_at/total: tag add/remove, tag delete (cascades into the
+# association table), and document delete (the keyset path's reltuples
+# estimate doesn't budge until autoanalyze). Same scheme as the search
+# cache's generation.
+_document_generation = 0
+
+
+def invalidate_document_etags() -> None:
+    """Makes every outstanding document ETag stale.
+
+    Called after mutations that change document representations without
+    moving the fields the ETags are built from.
+    """
+    global _document_generation
+    _document_generation += 1
+
+
+# Compiled once at import: sanitize_filename runs on every upload, and
+# the per-call re-cache lookup for an inline pattern is measurable.
+_UNSAFE_CHARS_RE = re.compile(r'[^\w.\-]')
+_NULL_TRANS = str.maketrans('', '', '\x00')
+
 
 def sanitize_filename(filename: str) -> str:
     """
     Sanitizes a filename to prevent path traversal attacks.
-    
+
     - Extracts only the base name (removes directory components)
     - Removes null bytes and other dangerous characters
     - Replaces unsafe characters with underscores
-    - Adds a UUID prefix to prevent filename collisions
+    - Adds a random prefix to prevent filename collisions
     """
     if not filename:
         raise ValueError("Filename cannot be empty")
-    
-    # Extract only the base filename (removes any path components like ../)
-    safe_name = os.path.basename(filename)
-    
-    # Remove null bytes which can be used to bypass checks
-    safe_name = safe_name.replace('\x00', '')
-    
-    # Remove or replace potentially dangerous characters
-    # Keep only alphanumeric, dots, underscores, hyphens
-    safe_name = re.sub(r'[^\w.\-]', '_', safe_name)
-    
+
+    # Extract only the base filename (removes any path components like ../),
+    # strip null bytes which can be used to bypass checks, and replace
+    # everything but alphanumerics, dots, underscores, hyphens
+    safe_name = _UNSAFE_CHARS_RE.sub('_', os.path.basename(filename).translate(_NULL_TRANS))
+
     # Ensure the filename is not empty after sanitization
     if not safe_name or safe_name in ('.', '..'):
         raise ValueError("Invalid filename after sanitization")
-    
-    # Add UUID prefix to prevent filename collisions
-    unique_prefix = uuid.uuid4().hex[:8]
+
+    # Add a random prefix to prevent filename collisions (8 hex chars,
+    # generated directly instead of slicing a full uuid4 hex string)
+    unique_prefix = secrets.token_hex(4)
     safe_name = f"{unique_prefix}_{safe_name}"
-    
+
     return safe_name
 
 
-def validate_file_path(base_dir: str, file_path: str) -> bool:
+@lru_cache(maxsize=1)
+def _pdf_extractor():
+    """Imports the PDF text extractor on first use.
+
+    PyMuPDF is a large native extension; deferring the import keeps
+    cold-start time and per-worker RSS down for workers that only serve
+    reads. After the first upload this is a cached function-pointer lookup.
     """
-    Validates that the resolved file path is within the allowed base directory.
-    Prevents path traversal by checking the real path.
+    from app.services.pdf_processor import extract_text_from_pdf
+    return extract_text_from_pdf
+
+
+def _unlink_quietly(path: str) -> None:
+    """Removes a file, ignoring the case where it is already gone.
+
+    A single unlink syscall instead of an isfile stat followed by a
+    remove; run via run_in_threadpool so it never blocks the event loop.
     """
-    # Resolve to absolute paths
-    base_dir_resolved = os.path.realpath(base_dir)
-    file_path_resolved = os.path.realpath(file_path)
-    
-    # Check that the file path starts with the base directory
-    return file_path_resolved.startswith(base_dir_resolved + os.sep)
+    try:
+        os.remove(path)
+    except OSError:
+        pass
 
 
-async def validate_pdf_file(file: UploadFile) -> bytes:
+def validate_file_path(file_path: str) -> bool:
     """
-    Validates that the uploaded file is a valid PDF.
-    
+    Validates that the file path stays within the upload directory.
+
+    sanitize_filename has already reduced the name to [A-Za-z0-9_.-] with
+    no separators or '..', so a normpath prefix check is sufficient — a
+    pure string comparison with none of the readlink/stat syscalls that a
+    per-request realpath() would issue for every path component.
+    """
+    return os.path.normpath(file_path).startswith(_UPLOAD_DIR_PREFIX)
+
+
+async def validate_pdf_headers(request: Request, file: UploadFile) -> None:
+    """
+    Validates the upload from request headers alone, before the body is read.
+
     Performs multi-layer validation:
     1. Filename validation - must have a filename
     2. Extension check - filename must end with .pdf
     3. Content-Type check - must be application/pdf
-    4. File size check - must not exceed maximum allowed size
-    5. Empty file check - must have content
-    6. Magic bytes check - file must start with %PDF signature
-    
-    Returns the file content if valid.
+    4. Content-Length check - declared size must not exceed the limit
+
+    Rejecting on Content-Length means an oversized upload fails with 413
+    before a single body byte is consumed. Emptiness and magic bytes are
+    validated while the body is streamed to disk (see stream_upload_to_disk).
+
     Raises HTTPException if any validation fails.
     """
     # 1. Validate filename exists
@@ -94,7 +175,7 @@ async def validate_pdf_file(file: UploadFile) -> bytes:
             status_code=400,
             detail="Filename is required."
         )
-    
+
     # 2. Validate file extension
     ext = os.path.splitext(file.filename)[1].lower()
     if ext not in ALLOWED_EXTENSIONS:
@@ -102,163 +183,210 @@ async def validate_pdf_file(file: UploadFile) -> bytes:
             status_code=400,
             detail=f"Invalid file extension '{ext}'. Only PDF files (.pdf) are allowed."
         )
-    
+
     # 3. Validate Content-Type
     if file.content_type not in ALLOWED_CONTENT_TYPES:
         raise HTTPException(
             status_code=400,
             detail=f"Invalid content type '{file.content_type}'. Only PDF files (application/pdf) are allowed."
         )
-    
-    # 4. Read file content for size and magic bytes validation
-    content = await file.read()
-    
-    # 5. Validate file size
-    file_size = len(content)
-    if file_size > MAX_FILE_SIZE:
-        max_size_mb = MAX_FILE_SIZE // (1024 * 1024)
-        raise HTTPException(
-            status_code=400,
-            detail=f"File too large ({file_size // (1024 * 1024)} MB). Maximum allowed size is {max_size_mb} MB."
-        )
-    
-    # 6. Validate file is not empty
-    if file_size == 0:
-        raise HTTPException(
-            status_code=400,
-            detail="File is empty. Please upload a valid PDF file."
-        )
-    
-    # 7. Validate PDF magic bytes (signature)
-    # PDF files must start with "%PDF" (bytes: 0x25 0x50 0x44 0x46)
-    if not content.startswith(PDF_MAGIC_BYTES):
+
+    # 4. Validate declared size (the streamed write re-checks the real size,
+    # so a lying Content-Length still cannot exceed the limit)
+    if int(request.headers.get("content-length", 0)) > MAX_FILE_SIZE:
         raise HTTPException(
-            status_code=400,
-            detail="Invalid PDF file. The file content does not match PDF format signature."
+            status_code=413,
+            detail=f"File too large. Maximum allowed size is {MAX_SIZE_MB} MB."
         )
-    
-    return content
+
+
+async def stream_upload_to_disk(file: UploadFile, file_path: str) -> int:
+    """
+    Streams the uploaded file to disk in chunks, validating as it goes.
+
+    The PDF magic bytes are checked on the first 4 bytes and the size limit
+    is enforced incrementally, so at most one chunk (1 MiB) is held in
+    memory per upload and an oversized or non-PDF body is rejected without
+    ever being fully buffered. The partial file is removed on failure.
+
+    Returns the total number of bytes written.
+    Raises HTTPException if the content is empty, not a PDF, or too large.
+    """
+    try:
+        async with aiofiles.open(file_path, "wb") as f:
+            # Validate PDF magic bytes (signature) on the first 4 bytes only.
+            # PDF files must start with "%PDF" (bytes: 0x25 0x50 0x44 0x46)
+            head = await file.read(len(PDF_MAGIC_BYTES))
+            if not head:
+                raise HTTPException(
+                    status_code=400,
+                    detail="File is empty. Please upload a valid PDF file."
+                )
+            if head != PDF_MAGIC_BYTES:
+                raise HTTPException(
+                    status_code=415,
+                    detail="Invalid PDF file. The file content does not match PDF format signature."
+                )
+            await f.write(head)
+            file_size = len(head)
+
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                file_size += len(chunk)
+                if file_size > MAX_FILE_SIZE:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File too large. Maximum allowed size is {MAX_SIZE_MB} MB."
+                    )
+                await f.write(chunk)
+    except HTTPException:
+        # Clean up the partial file before propagating the error
+        await run_in_threadpool(_unlink_quietly, file_path)
+        raise
+
+    return file_size
 
 
 @router.post("/documents")
-async def upload_document(file: UploadFile, db: AsyncSession = Depends(get_db)):
-    # Validate that the file is a valid PDF and get its content
-    # This performs extension, content-type, size, and magic bytes validation
-    content = await validate_pdf_file(file)
-    file_size = len(content)
-    
-    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-    
+async def upload_document(request: Request, file: UploadFile, db: AsyncSession = Depends(get_db)):
+    # Validate filename, extension, content-type, and declared size before
+    # reading any of the body
+    await validate_pdf_headers(request, file)
+
     # Sanitize filename to prevent path traversal attacks
     try:
         safe_filename = sanitize_filename(file.filename)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
-    
-    file_path = os.path.join(settings.UPLOAD_DIR, safe_filename)
-    
+
+    file_path = os.path.join(_UPLOAD_DIR, safe_filename)
+
     # Double-check that the final path is within the upload directory
-    if not validate_file_path(settings.UPLOAD_DIR, file_path):
+    if not validate_file_path(file_path):
         raise HTTPException(status_code=400, detail="Invalid file path")
 
-    with open(file_path, "wb") as f:
-        f.write(content)
+    # Stream the body to disk; validates magic bytes and size incrementally
+    file_size = await stream_upload_to_disk(file, file_path)
 
     # Extract text from the PDF, cleaning up the file if extraction fails
     try:
-        text_content, page_count = await extract_text_from_pdf(file_path)
+        page_texts, page_count = await _pdf_extractor()(file_path)
     except Exception as e:
         # Clean up the file on disk before propagating the error
-        try:
-            if os.path.isfile(file_path):
-                os.remove(file_path)
-        except OSError:
-            pass  # Ignore cleanup errors, the original error is more important
+        await run_in_threadpool(_unlink_quietly, file_path)
         raise HTTPException(
             status_code=422,
             detail=f"Failed to process PDF file: {str(e)}"
         )
 
-    document = Document(
-        filename=file.filename,
-        file_path=file_path,
-        content=text_content,
-        file_size=file_size,
-        page_count=page_count,
+    # The page texts go to Postgres as an array and are joined there (see
+    # _INSERT_DOCUMENT); both inserts ride one transaction and one WAL
+    # fsync instead of three
+    result = await db.execute(
+        _INSERT_DOCUMENT,
+        {
+            "filename": file.filename,
+            "file_path": file_path,
+            "pages": page_texts,
+            "file_size": file_size,
+            "page_count": page_count,
+        },
     )
-    db.add(document)
-    await db.commit()
-    await db.refresh(document)
-
-    # Populate the search_vector using PostgreSQL's to_tsvector function
-    # This is done as a separate UPDATE to use the database's text processing
-    # Using 'portuguese' configuration for proper stemming and stop words
-    if text_content:
-        await db.execute(
-            text("""
-                UPDATE documents 
-                SET search_vector = to_tsvector('portuguese', :content)
-                WHERE id = :doc_id
-            """),
-            {"content": text_content, "doc_id": document.id}
-        )
-        await db.commit()
+    document_id = result.scalar_one()
 
     processing_status = ProcessingStatus(
-        document_id=document.id,
+        document_id=document_id,
         status="completed",
-        processed_at=datetime.utcnow(),
     )
     db.add(processing_status)
+
+    # SET LOCAL applies to this transaction only: the commit is
+    # acknowledged once the WAL reaches the OS page cache instead of
+    # waiting for fsync, so concurrent uploads don't stampede the WAL with
+    # one flush each. The durability trade-off is deliberate — a crash in
+    # that window loses only this metadata row and leaves an orphaned file
+    # on disk, not an inconsistent database.
+    await db.execute(text("SET LOCAL synchronous_commit = 'off'"))
     await db.commit()
 
-    return {"id": document.id, "filename": document.filename}
+    invalidate_search_cache()
+
+    return {"id": document_id, "filename": file.filename}
 
 
 @router.get("/documents", response_model=DocumentListResponse)
 async def list_documents(
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1, description="Page number (1-indexed)"),
     page_size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Items per page"),
     tag_id: int = Query(None, description="Filter by tag ID"),
+    after_created_at: datetime = Query(None, description="Keyset cursor: created_at of the last seen document"),
+    after_id: int = Query(None, description="Keyset cursor: id of the last seen document"),
     db: AsyncSession = Depends(get_db),
 ):
     """
     List documents with pagination and optional tag filtering.
-    
+
     - **page**: Page number starting from 1
     - **page_size**: Number of items per page (max 100)
     - **tag_id**: Optional tag ID to filter documents
+    - **after_created_at** / **after_id**: keyset cursor (both from the
+      previous page's next_created_at/next_id); when supplied, pagination
+      seeks past the cursor instead of using OFFSET, so deep pages stay
+      O(page_size) and the count is estimated rather than exact
     """
     # Build base query
     base_query = select(Document)
-    
+
     # Apply tag filter if provided
     if tag_id is not None:
         base_query = base_query.join(document_tags).where(document_tags.c.tag_id == tag_id)
-    
-    # Count total documents matching the filter
-    count_query = select(func.count()).select_from(base_query.subquery())
-    count_result = await db.execute(count_query)
-    total = count_result.scalar_one()
-    
+
+    use_keyset = after_created_at is not None and after_id is not None
+
+    if use_keyset and tag_id is None:
+        # Keyset pages skip the exact count(*) — a full-table scan as the
+        # table grows — in favor of the planner's row estimate
+        estimate_result = await db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = 'documents'")
+        )
+        total = max(estimate_result.scalar_one(), 0)
+    else:
+        # Count total documents matching the filter
+        count_query = select(func.count()).select_from(base_query.subquery())
+        count_result = await db.execute(count_query)
+        total = count_result.scalar_one()
+
     # Calculate pagination
     total_pages = (total + page_size - 1) // page_size if total > 0 else 1
-    offset = (page - 1) * page_size
-    
-    # Use selectinload to eager load processing_status and tags in a single query
-    # This avoids the N+1 query problem
-    result = await db.execute(
+
+    # Ordering includes id as a tiebreaker so the keyset cursor is
+    # unambiguous; both columns are covered by ix_documents_created_id
+    stmt = (
         base_query
-        .options(
-            selectinload(Document.processing_status),
-            selectinload(Document.tags)
-        )
-        .order_by(Document.created_at.desc())
-        .offset(offset)
+        .options(*_DOCUMENT_LOAD_OPTIONS)
+        .order_by(Document.created_at.desc(), Document.id.desc())
         .limit(page_size)
     )
+    if use_keyset:
+        stmt = stmt.where(
+            tuple_(Document.created_at, Document.id) < tuple_(after_created_at, after_id)
+        )
+    else:
+        stmt = stmt.offset((page - 1) * page_size)
+
+    result = await db.execute(stmt)
     documents = result.scalars().all()
 
+    # Weak ETag from the page signature (newest timestamp, total, paging
+    # params): a repeat request for an unchanged page returns 304 and
+    # skips building and serializing the whole response body
+    newest = documents[0].created_at.timestamp() if documents else 0
+    etag = f'W/"{_document_generation}-{total}-{newest}-{page}-{page_size}-{tag_id}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
     items = [
         DocumentResponse(
             id=doc.id,
@@ -272,30 +400,43 @@ async def list_documents(
         for doc in documents
     ]
     
+    # Expose the cursor for the next page; a short page means we're done
+    last = documents[-1] if len(documents) == page_size else None
+
     return DocumentListResponse(
         items=items,
         total=total,
         page=page,
         page_size=page_size,
         total_pages=total_pages,
+        next_created_at=last.created_at if last else None,
+        next_id=last.id if last else None,
     )
 
 
 @router.get("/documents/{document_id}")
-async def get_document(document_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(Document)
-        .options(
-            selectinload(Document.processing_status),
-            selectinload(Document.tags)
-        )
-        .where(Document.id == document_id)
-    )
-    document = result.scalar_one_or_none()
+async def get_document(
+    document_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+):
+    # Primary-key lookup via the session: hits the identity map first and
+    # skips building/compiling a Select
+    document = await db.get(Document, document_id, options=_DOCUMENT_LOAD_OPTIONS)
 
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
 
+    # The document's own columns are immutable after upload, so
+    # generation+created_at+id identifies the representation — the
+    # generation covers the mutable tags field. A 304 here saves
+    # re-sending the content field, which can be megabytes for a large PDF.
+    etag = f'W/"{_document_generation}-{int(document.created_at.timestamp())}-{document.id}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
     return DocumentDetail(
         id=document.id,
         filename=document.filename,
@@ -312,43 +453,34 @@ async def get_document(document_id: int, db: AsyncSession = Depends(get_db)):
 async def delete_document(document_id: int, db: AsyncSession = Depends(get_db)):
     """
     Deletes a document and its associated physical file.
-    
-    This endpoint:
-    1. Removes the ProcessingStatus record (if exists)
-    2. Removes the Document record from the database
-    3. Deletes the physical PDF file from disk
-    
+
+    A single DELETE ... RETURNING statement removes the document and hands
+    back its file_path; the ProcessingStatus row (and any tag associations)
+    go with it via the ON DELETE CASCADE foreign keys, so no separate
+    fetch or child delete is needed.
+
     The physical file deletion is done after the database commit to ensure
     data consistency. If the file doesn't exist, the deletion is silently ignored.
     """
-    result = await db.execute(select(Document).where(Document.id == document_id))
-    document = result.scalar_one_or_none()
+    result = await db.execute(
+        delete(Document)
+        .where(Document.id == document_id)
+        .returning(Document.file_path)
+    )
+    row = result.first()
 
-    if not document:
+    if row is None:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    # Store file_path before deleting the document record
-    file_path = document.file_path
-
-    status_result = await db.execute(
-        select(ProcessingStatus).where(ProcessingStatus.document_id == document.id)
-    )
-    status = status_result.scalar_one_or_none()
-    if status:
-        await db.delete(status)
-
-    await db.delete(document)
+    file_path = row[0]
     await db.commit()
 
+    invalidate_search_cache()
+    invalidate_document_etags()
+
     # Delete the physical file after successful database commit
     # This order ensures we don't leave orphaned DB records if file deletion fails
     if file_path:
-        try:
-            if os.path.isfile(file_path):
-                os.remove(file_path)
-        except OSError:
-            # Log the error but don't fail the request since DB deletion succeeded
-            # In production, this should be logged for monitoring
-            pass
+        await run_in_threadpool(_unlink_quietly, file_path)
 
     return {"message": "Document deleted"}
@@ -1,142 +1,187 @@
-from fastapi import APIRouter, Depends, Query
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+
+import orjson
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import ORJSONResponse
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.schemas import SearchResult
 
 router = APIRouter()
 
+# Search across content, filename, and tags in a single scan. Each source
+# contributes a different base rank and GREATEST picks the best match,
+# so every document is visited once — no UNION re-scans and no
+# DISTINCT/GROUP BY aggregation over up to 4x the rows. The ILIKE
+# predicates are backed by trigram GIN indexes on filename and tag names.
+# Module-level so SQLAlchemy's compiled cache always hits and asyncpg's
+# prepared-statement cache key stays stable across requests.
+_SEARCH_QUERY = text("""
+    WITH q AS (
+        -- Built exactly once per statement: the Portuguese dictionary and
+        -- stemmer run on the search term here and nowhere else.
+        -- websearch_to_tsquery understands quoted phrases, -exclusions,
+        -- and OR, and never errors on user input.
+        SELECT websearch_to_tsquery('portuguese', :search_term) AS tsq
+    ),
+    ranked AS (
+        -- Phase 1: filter, rank, and LIMIT on cheap columns only, so the
+        -- snippet projection below never runs for rows that don't make
+        -- the final page
+        SELECT
+            d.id,
+            d.filename,
+            d.snippet,
+            d.content,
+            d.created_at,
+            GREATEST(
+                -- Full-text match on content (highest priority when ranked)
+                CASE WHEN d.search_vector @@ q.tsq
+                     THEN ts_rank(d.search_vector, q.tsq) + 1.0
+                     ELSE 0 END,
+                -- Filename match (high priority)
+                CASE WHEN d.filename ILIKE :ilike_term THEN 2.0 ELSE 0 END,
+                -- Tag name match
+                CASE WHEN EXISTS (
+                        SELECT 1
+                        FROM document_tags dt
+                        INNER JOIN tags t ON dt.tag_id = t.id
+                        WHERE dt.document_id = d.id AND t.name ILIKE :ilike_term
+                     ) THEN 1.5 ELSE 0 END
+            ) as rank
+        FROM documents d, q
+        WHERE
+            d.search_vector @@ q.tsq
+            OR d.filename ILIKE :ilike_term
+            OR EXISTS (
+                SELECT 1
+                FROM document_tags dt
+                INNER JOIN tags t ON dt.tag_id = t.id
+                WHERE dt.document_id = d.id AND t.name ILIKE :ilike_term
+            )
+        ORDER BY rank DESC, d.created_at DESC
+        LIMIT 100
+    )
+    -- Phase 2: produce snippets for the surviving 100 rows at most. The
+    -- snippet column is materialized at upload; the CASE fallback (which
+    -- detoasts content) only runs for rows ingested before it existed.
+    SELECT
+        id,
+        filename,
+        COALESCE(
+            snippet,
+            CASE WHEN char_length(COALESCE(content, '')) > 200
+                 THEN SUBSTRING(content, 1, 200) || '...'
+                 ELSE COALESCE(content, '')
+            END
+        ) as snippet,
+        rank
+    FROM ranked
+    ORDER BY rank DESC, created_at DESC
+""")
 
-def sanitize_search_query(query: str) -> str:
-    """
-    Sanitizes the search query for use with PostgreSQL full-text search.
-    
-    Removes special characters that could break the tsquery parser,
-    keeping only alphanumeric characters, spaces, and accented letters.
+
+# Search query streams have strong temporal locality, so repeated queries
+# are answered from an in-process LRU keyed by (generation, query). The
+# generation counter is bumped on document mutations, invalidating every
+# cached entry at once; the TTL bounds staleness from anything else (e.g.
+# tag renames) without per-event bookkeeping.
+_SEARCH_CACHE_SIZE = 1024
+_SEARCH_CACHE_TTL = 60.0  # seconds
+_search_cache: OrderedDict = OrderedDict()
+_search_cache_lock = asyncio.Lock()
+_search_generation = 0
+
+# private: results may differ per user once auth lands, and they should
+# never be shared from an intermediary cache. max-age matches half the
+# server-side TTL, so a browser re-hit is free and never much staler than
+# what the LRU would have served anyway.
+_SEARCH_CACHE_CONTROL = "private, max-age=30"
+
+
+def _search_response(request: Request, body: bytes, etag: str) -> Response:
+    """Builds the /search response, answering If-None-Match with a 304."""
+    headers = {"ETag": etag, "Cache-Control": _SEARCH_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def invalidate_search_cache() -> None:
+    """Marks all cached search results stale.
+
+    Called after document upload/delete. Bumping the generation changes
+    every cache key, so stale entries simply age out of the LRU instead of
+    needing to be scanned and removed under the lock.
     """
-    # Remove characters that are special in tsquery syntax
-    # Keep letters (including accented), numbers, and spaces
-    sanitized = "".join(
-        char if char.isalnum() or char.isspace() else " "
-        for char in query
-    )
-    # Collapse multiple spaces into one and strip
-    return " ".join(sanitized.split())
+    global _search_generation
+    _search_generation += 1
 
 
 @router.get("/search")
 async def search_documents(
-    q: str = Query(..., min_length=1, description="Search query"),
+    request: Request,
+    # The pattern requires at least one alphanumeric character, so queries
+    # that are all punctuation/whitespace are rejected with a 422 by
+    # pydantic-core before the handler runs. No further sanitization is
+    # needed: websearch_to_tsquery accepts arbitrary user input by design.
+    q: str = Query(..., min_length=1, max_length=200, pattern=r"[^\W_]", description="Search query"),
     db: AsyncSession = Depends(get_db),
 ):
     """
     Search documents by content, filename, and tags.
-    
+
     Search strategy:
     1. Full-text search on content (using search_vector if available)
     2. ILIKE search on filename
     3. ILIKE search on associated tag names
-    
+
     Results are ranked by relevance and deduplicated.
     """
-    sanitized_query = sanitize_search_query(q)
-    
-    if not sanitized_query:
-        return []
-    
-    # Search across content, filename, and tags using UNION to combine results
-    # Each source gets a different base rank to prioritize matches
-    query = text("""
-        WITH search_results AS (
-            -- Search by full-text vector (highest priority when available)
-            SELECT DISTINCT
-                d.id,
-                d.filename,
-                SUBSTRING(COALESCE(d.content, ''), 1, 200) as snippet,
-                CASE 
-                    WHEN d.search_vector IS NOT NULL THEN
-                        ts_rank(d.search_vector, plainto_tsquery('portuguese', :search_term)) + 1.0
-                    ELSE 0.5
-                END as rank,
-                d.created_at
-            FROM documents d
-            WHERE 
-                d.search_vector @@ plainto_tsquery('portuguese', :search_term)
-            
-            UNION
-            
-            -- Search by content ILIKE (fallback for documents without search_vector)
-            SELECT DISTINCT
-                d.id,
-                d.filename,
-                SUBSTRING(COALESCE(d.content, ''), 1, 200) as snippet,
-                0.5 as rank,
-                d.created_at
-            FROM documents d
-            WHERE 
-                d.content ILIKE :ilike_term
-            
-            UNION
-            
-            -- Search by filename (high priority)
-            SELECT DISTINCT
-                d.id,
-                d.filename,
-                SUBSTRING(COALESCE(d.content, ''), 1, 200) as snippet,
-                2.0 as rank,
-                d.created_at
-            FROM documents d
-            WHERE 
-                d.filename ILIKE :ilike_term
-            
-            UNION
-            
-            -- Search by tag names
-            SELECT DISTINCT
-                d.id,
-                d.filename,
-                SUBSTRING(COALESCE(d.content, ''), 1, 200) as snippet,
-                1.5 as rank,
-                d.created_at
-            FROM documents d
-            INNER JOIN document_tags dt ON d.id = dt.document_id
-            INNER JOIN tags t ON dt.tag_id = t.id
-            WHERE 
-                t.name ILIKE :ilike_term
-        )
-        SELECT 
-            id,
-            filename,
-            snippet,
-            MAX(rank) as rank
-        FROM search_results
-        GROUP BY id, filename, snippet
-        ORDER BY rank DESC, MAX(created_at) DESC
-        LIMIT 100
-    """)
-    
+    query_text = q.strip()
+
+    if not query_text:
+        return ORJSONResponse([])
+
+    cache_key = (_search_generation, query_text)
+    now = time.monotonic()
+    async with _search_cache_lock:
+        entry = _search_cache.get(cache_key)
+        if entry is not None and now - entry[0] < _SEARCH_CACHE_TTL:
+            _search_cache.move_to_end(cache_key)
+            return _search_response(request, entry[1], entry[2])
+
     result = await db.execute(
-        query,
+        _SEARCH_QUERY,
         {
-            "search_term": sanitized_query,
-            "ilike_term": f"%{sanitized_query}%",
+            "search_term": query_text,
+            "ilike_term": f"%{query_text}%",
         }
     )
-    rows = result.fetchall()
-
-    results = []
-    for row in rows:
-        snippet = row[2] or ""
-        # Add ellipsis if snippet was truncated
-        if len(snippet) >= 200 and not snippet.endswith("..."):
-            snippet = snippet + "..."
-        results.append(
-            SearchResult(
-                id=row[0],
-                filename=row[1],
-                snippet=snippet,
-            )
-        )
+    # Snippets arrive final (truncation and ellipsis applied in SQL). The
+    # rows come straight from our own query and match the documented shape
+    # (see schemas.SearchResult), so plain dicts skip a Pydantic model
+    # build per row and go directly to the orjson encoder. mappings()
+    # yields dict-like rows without the Row wrapper, addressed by column
+    # name instead of position.
+    results = [
+        {"id": row["id"], "filename": row["filename"], "snippet": row["snippet"]}
+        for row in result.mappings()
+    ]
+
+    # Cache the encoded body and its ETag, so cache hits skip serialization
+    # too and every hit for the same results carries the same ETag
+    body = orjson.dumps(results)
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+    async with _search_cache_lock:
+        _search_cache[cache_key] = (now, body, etag)
+        _search_cache.move_to_end(cache_key)
+        while len(_search_cache) > _SEARCH_CACHE_SIZE:
+            _search_cache.popitem(last=False)
 
-    return results
+    return _search_response(request, body, etag)
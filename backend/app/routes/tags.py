@@ -4,32 +4,85 @@ Routes for managing document tags.
 Provides CRUD operations for tags and endpoints for managing
 document-tag associations.
 """
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select, func
+import hashlib
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy import delete, select, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.database import get_db
-from app.models import Tag, Document
+from app.models import Tag, Document, document_tags
+from app.routes.documents import invalidate_document_etags
 from app.schemas import TagCreate, TagResponse, TagListResponse
 
 router = APIRouter()
 
+# One compiled core schema validates a whole tag list in a single
+# pydantic-core call, instead of a model_validate per row
+_TAG_LIST_ADAPTER = TypeAdapter(list[TagResponse])
+
+# Serialized /tags body plus its ETag, valid until the next tag mutation.
+# The tag set changes rarely while frontends poll the endpoint, so cached
+# reads cost no DB query and no serialization at all, and clients holding
+# the current ETag get a bodyless 304. stale-while-revalidate lets
+# browsers keep painting the old list while refetching in the background.
+_tags_cache: tuple[bytes, str] | None = None
+_TAGS_CACHE_CONTROL = "max-age=300, stale-while-revalidate=60"
+
+
+async def _check_document_and_tag(db: AsyncSession, document_id: int, tag_id: int) -> None:
+    """Verifies both sides of an association in one round-trip.
+
+    Raises the appropriate 404 if either the document or the tag is
+    missing; avoids loading the document's full tag collection just to
+    answer an existence question.
+    """
+    result = await db.execute(
+        select(
+            select(Document.id).where(Document.id == document_id).exists(),
+            select(Tag.id).where(Tag.id == tag_id).exists(),
+        )
+    )
+    doc_exists, tag_exists = result.one()
+    if not doc_exists:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if not tag_exists:
+        raise HTTPException(status_code=404, detail="Tag not found")
+
 
 @router.get("/tags", response_model=TagListResponse)
-async def list_tags(db: AsyncSession = Depends(get_db)):
+async def list_tags(request: Request, db: AsyncSession = Depends(get_db)):
     """
     List all available tags ordered by name.
+
+    The serialized response is cached in-process and invalidated by
+    create_tag/delete_tag, so reads between mutations skip the database.
+    A matching If-None-Match gets a 304 without the body.
     """
-    result = await db.execute(
-        select(Tag).order_by(Tag.name)
-    )
-    tags = result.scalars().all()
-    
-    return TagListResponse(
-        items=[TagResponse.model_validate(tag) for tag in tags],
-        total=len(tags)
-    )
+    global _tags_cache
+
+    if _tags_cache is None:
+        result = await db.execute(
+            select(Tag).order_by(Tag.name)
+        )
+        tags = result.scalars().all()
+
+        payload = TagListResponse(
+            items=_TAG_LIST_ADAPTER.validate_python(tags, from_attributes=True),
+            total=len(tags)
+        )
+        body = orjson.dumps(payload.model_dump())
+        _tags_cache = (body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"')
+
+    body, etag = _tags_cache
+    headers = {"ETag": etag, "Cache-Control": _TAGS_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @router.post("/tags", response_model=TagResponse, status_code=201)
@@ -56,7 +109,10 @@ async def create_tag(tag_data: TagCreate, db: AsyncSession = Depends(get_db)):
     db.add(tag)
     await db.commit()
     await db.refresh(tag)
-    
+
+    global _tags_cache
+    _tags_cache = None
+
     return TagResponse.model_validate(tag)
 
 
@@ -89,7 +145,12 @@ async def delete_tag(tag_id: int, db: AsyncSession = Depends(get_db)):
     
     await db.delete(tag)
     await db.commit()
-    
+
+    global _tags_cache
+    _tags_cache = None
+    # The cascade strips the tag from every document that had it
+    invalidate_document_etags()
+
     return {"message": "Tag deleted"}
 
 
@@ -102,31 +163,22 @@ async def add_tag_to_document(
     """
     Add a tag to a document.
     """
-    # Fetch document with its tags
+    await _check_document_and_tag(db, document_id, tag_id)
+
+    # Insert straight into the association table; ON CONFLICT DO NOTHING
+    # turns "already associated" into rowcount 0 instead of requiring the
+    # document's whole tag list to be loaded for a membership test
     result = await db.execute(
-        select(Document)
-        .options(selectinload(Document.tags))
-        .where(Document.id == document_id)
+        pg_insert(document_tags)
+        .values(document_id=document_id, tag_id=tag_id)
+        .on_conflict_do_nothing()
     )
-    document = result.scalar_one_or_none()
-    
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
-    
-    # Fetch tag
-    tag_result = await db.execute(select(Tag).where(Tag.id == tag_id))
-    tag = tag_result.scalar_one_or_none()
-    
-    if not tag:
-        raise HTTPException(status_code=404, detail="Tag not found")
-    
-    # Check if tag is already associated
-    if tag in document.tags:
+    if result.rowcount == 0:
         raise HTTPException(status_code=409, detail="Tag already added to document")
-    
-    document.tags.append(tag)
+
     await db.commit()
-    
+    invalidate_document_etags()
+
     return {"message": "Tag added to document"}
 
 
@@ -139,31 +191,23 @@ async def remove_tag_from_document(
     """
     Remove a tag from a document.
     """
-    # Fetch document with its tags
+    # Delete the association row directly; the happy path is a single
+    # statement plus commit
     result = await db.execute(
-        select(Document)
-        .options(selectinload(Document.tags))
-        .where(Document.id == document_id)
+        delete(document_tags).where(
+            document_tags.c.document_id == document_id,
+            document_tags.c.tag_id == tag_id,
+        )
     )
-    document = result.scalar_one_or_none()
-    
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
-    
-    # Fetch tag
-    tag_result = await db.execute(select(Tag).where(Tag.id == tag_id))
-    tag = tag_result.scalar_one_or_none()
-    
-    if not tag:
-        raise HTTPException(status_code=404, detail="Tag not found")
-    
-    # Check if tag is associated
-    if tag not in document.tags:
+    if result.rowcount == 0:
+        # Only the failure path pays for the existence check, to pick the
+        # right 404 (missing document/tag vs. tag not on document)
+        await _check_document_and_tag(db, document_id, tag_id)
         raise HTTPException(status_code=404, detail="Tag not found on document")
-    
-    document.tags.remove(tag)
+
     await db.commit()
-    
+    invalidate_document_etags()
+
     return {"message": "Tag removed from document"}
 
 
@@ -186,7 +230,7 @@ async def get_document_tags(
         raise HTTPException(status_code=404, detail="Document not found")
     
     return TagListResponse(
-        items=[TagResponse.model_validate(tag) for tag in document.tags],
+        items=_TAG_LIST_ADAPTER.validate_python(document.tags, from_attributes=True),
         total=len(document.tags)
     )
 
@@ -73,8 +73,13 @@ class PaginatedResponse(BaseModel, Generic[T]):
 
 
 class DocumentListResponse(PaginatedResponse[DocumentResponse]):
-    """Paginated response for document listing."""
-    pass
+    """Paginated response for document listing.
+
+    next_created_at/next_id form the keyset cursor for the following page;
+    both are None when this is the last page.
+    """
+    next_created_at: Optional[datetime] = None
+    next_id: Optional[int] = None
 
 
 # ========== Document-Tag Association Schemas ==========